@@ -39,18 +39,65 @@ Examples::
 
 """
 
-from mwclient import __version__ as mwclient_version
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from wikiget.version import __version__
 
+if TYPE_CHECKING:
+    # typing.Final is only available in Python 3.8+
+    from typing_extensions import Final
+
 # set some global constants
-BLOCKSIZE = 65536
-CHUNKSIZE = 1024
-DEFAULT_SITE = "commons.wikimedia.org"
-DEFAULT_PATH = "/w/"
-USER_AGENT = (
-    f"wikiget/{__version__} (https://github.com/clpo13/wikiget) "
-    f"mwclient/{mwclient_version}"
-)
-STD_VERBOSE = 1
-VERY_VERBOSE = 2
+BLOCKSIZE: Final = 65536
+CHUNKSIZE: Final = 1024
+DOWNLOAD_BLOCKSIZE: Final = 1048576
+# smallest download worth waiting on the disk for, so that its pages can be dropped from
+# the page cache
+DROP_CACHE_MIN_SIZE: Final = 67108864
+DEFAULT_SITE: Final = "commons.wikimedia.org"
+DEFAULT_PATH: Final = "/w/"
+# maximum number of titles per API query for users without the apihighlimits right
+QUERY_LIMIT: Final = 50
+STD_VERBOSE: Final = 1
+VERY_VERBOSE: Final = 2
+
+
+@lru_cache(maxsize=None)
+def get_user_agent() -> str:
+    """Return the user agent string used to identify the program to MediaWiki sites.
+
+    mwclient is only imported (to get its version number) the first time this is
+    called, since it's a relatively slow import that isn't needed just to start the
+    program.
+
+    :return: user agent string
+    :rtype: str
+    """
+    # deferred so that importing wikiget doesn't also import mwclient
+    from mwclient import __version__ as mwclient_version  # noqa: PLC0415
+
+    return (
+        f"wikiget/{__version__} (https://github.com/clpo13/wikiget) "
+        f"mwclient/{mwclient_version}"
+    )
+
+
+def __getattr__(name: str) -> str:
+    """Look up module attributes that are computed on first access.
+
+    USER_AGENT used to be a constant; it's still available, but is built with
+    get_user_agent so that mwclient isn't imported until it's needed.
+
+    :param name: name of the attribute
+    :type name: str
+    :raises AttributeError: there's no attribute with the given name
+    :return: value of the attribute
+    :rtype: str
+    """
+    if name == "USER_AGENT":
+        return get_user_agent()
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
@@ -20,24 +20,63 @@
 from __future__ import annotations
 
 import logging
+from threading import Lock
 from typing import TYPE_CHECKING
+from weakref import WeakKeyDictionary
 
-from mwclient import APIError, InvalidResponse, LoginError, Site
+from mwclient import APIError, InvalidPageTitle, InvalidResponse, LoginError, Site
+from mwclient.image import Image
 from requests import ConnectionError, HTTPError
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 
 import wikiget
 
 if TYPE_CHECKING:
     from argparse import Namespace
 
-    from mwclient.image import Image
-
 logger = logging.getLogger(__name__)
 
+# Site objects that have already been connected to, keyed by hostname, path, and
+# username, so that repeated calls (e.g. in batch mode) share one connection and login
+_site_cache: dict[tuple[str, str, str], Site] = {}
+_site_cache_lock = Lock()
+
+# Image objects that have already been retrieved, per Site, so that looking up the same
+# file twice (e.g. a duplicated batch file line) doesn't repeat the API request
+_image_cache: WeakKeyDictionary[Site, dict[str, Image]] = WeakKeyDictionary()
+_image_cache_lock = Lock()
+
 
 def connect_to_site(site_name: str, args: Namespace) -> Site:
     """Create and return a Site object using the given site name and CLI arguments.
 
+    Sites are cached, so calling this again with the same site name, path, and username
+    returns the existing Site instead of connecting (and logging in) again. This is safe
+    to call from multiple threads.
+
+    :param site_name: hostname of the site to connect to
+    :type site_name: str
+    :param args: command-line arguments and their values
+    :type args: argparse.Namespace
+    :return: a new or previously cached Site object
+    :rtype: mwclient.Site
+    """
+    key = (site_name, args.path, args.username)
+
+    # hold the lock while connecting so that concurrent callers don't each open their
+    # own connection to the same site
+    with _site_cache_lock:
+        site = _site_cache.get(key)
+        if site:
+            logger.debug("Reusing the existing connection to %s", site_name)
+        else:
+            site = _site_cache[key] = _new_site(site_name, args)
+    return site
+
+
+def _new_site(site_name: str, args: Namespace) -> Site:
+    """Connect to the given site and log in if credentials were provided.
+
     :param site_name: hostname of the site to connect to
     :type site_name: str
     :param args: command-line arguments and their values
@@ -49,7 +88,16 @@ def connect_to_site(site_name: str, args: Namespace) -> Site:
 
     try:
         # connect to site and identify ourselves
-        site = Site(site_name, path=args.path, clients_useragent=wikiget.USER_AGENT)
+        site = Site(
+            site_name, path=args.path, clients_useragent=wikiget.get_user_agent()
+        )
+        # the Site's session is shared by all download threads, so make sure its
+        # connection pool is big enough for every thread to keep a connection alive
+        adapter = HTTPAdapter(
+            pool_maxsize=max(args.threads, DEFAULT_POOLSIZE), pool_block=True
+        )
+        site.connection.mount("https://", adapter)
+        site.connection.mount("http://", adapter)
         if args.username and args.password:
             logger.info("Attempting to authenticate with credentials")
             site.login(args.username, args.password)
@@ -80,7 +128,8 @@ def query_api(filename: str, site: Site) -> Image:
     """Query the given Site for an Image object matching the given filename.
 
     Even if there's no file by that name on the site, an Image will still be returned,
-    though with an empty imageinfo attribute.
+    though with an empty imageinfo attribute. Results are cached per Site, but failed
+    queries aren't, so they'll be retried on the next call.
 
     :param filename: name of the file to retrieve
     :type filename: str
@@ -89,6 +138,12 @@ def query_api(filename: str, site: Site) -> Image:
     :return: an Image object representing the requested file
     :rtype: mwclient.image.Image
     """
+    with _image_cache_lock:
+        image = _image_cache.get(site, {}).get(filename)
+    if image is not None:
+        logger.debug("Reusing the existing image info for %s", filename)
+        return image
+
     try:
         # get info about the target file
         image = site.images[filename]
@@ -101,5 +156,71 @@ def query_api(filename: str, site: Site) -> Image:
         for i in e.args:
             logger.debug(i)
         raise
+    except InvalidPageTitle as e:
+        # the title passed our own validation but was rejected by the site, e.g. because
+        # it contains characters like "<" or "{"
+        logger.error("Invalid file name: %s", e)
+        raise
 
+    with _image_cache_lock:
+        _image_cache.setdefault(site, {})[filename] = image
     return image
+
+
+def query_api_batch(filenames: list[str], site: Site) -> dict[str, Image]:
+    """Query the given Site for Image objects matching several filenames at once.
+
+    Instead of one API request per file, the filenames are looked up in groups of up to
+    QUERY_LIMIT titles per request. The resulting Images are cached, so later calls to
+    query_api for the same files won't make any more API requests. As with query_api,
+    files that don't exist on the site will still have an Image, though with an empty
+    imageinfo attribute. Files whose names the site rejects as invalid are left out, so
+    that query_api can report them.
+
+    :param filenames: names of the files to retrieve
+    :type filenames: list[str]
+    :param site: the Site object to query
+    :type site: mwclient.Site
+    :raises APIError: the API returned an error, e.g. access was denied
+    :return: a dictionary of Image objects keyed by filename
+    :rtype: dict[str, mwclient.image.Image]
+    """
+    images = {}
+
+    with _image_cache_lock:
+        cached = _image_cache.get(site, {})
+        # skip files we already know about; titles are separated by "|" in the query,
+        # so any filename containing one has to be looked up with query_api instead
+        to_query = [
+            name
+            for name in dict.fromkeys(filenames)
+            if name not in cached and "|" not in name
+        ]
+
+    prefix = site.namespaces[6]  # usually "File"
+    for i in range(0, len(to_query), wikiget.QUERY_LIMIT):
+        titles = {
+            f"{prefix}:{name}": name for name in to_query[i : i + wikiget.QUERY_LIMIT]
+        }
+        logger.debug("Querying image info for %i files", len(titles))
+        result = site.get(
+            "query",
+            titles="|".join(titles),
+            prop="info|imageinfo",
+            inprop="protection",
+            iiprop="url|size|sha1",
+        )["query"]
+        # the API may return titles in normalized form (e.g. with the first letter
+        # capitalized), so map them back to the names we asked for
+        normalized = {n["to"]: n["from"] for n in result.get("normalized", [])}
+        for info in result["pages"].values():
+            title = normalized.get(info["title"], info["title"])
+            # Image raises InvalidPageTitle for titles the site rejects, so leave those
+            # for query_api to report when the file is downloaded
+            if title in titles and "invalid" not in info:
+                images[titles[title]] = Image(site, info["title"], info)
+
+    with _image_cache_lock:
+        _image_cache.setdefault(site, {}).update(images)
+        cached = _image_cache[site]
+        return {name: cached[name] for name in filenames if name in cached}
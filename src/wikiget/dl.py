@@ -19,16 +19,20 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import os
+import shutil
 from concurrent.futures import ThreadPoolExecutor
-from typing import TYPE_CHECKING
+from typing import IO, TYPE_CHECKING
 
-from mwclient import APIError, InvalidResponse, LoginError, Site
+import urllib3
+from mwclient import APIError, InvalidPageTitle, InvalidResponse, LoginError
 from requests import ConnectionError, HTTPError
 from tqdm import tqdm
 
 import wikiget
-from wikiget.client import connect_to_site, query_api
+from wikiget.client import connect_to_site, query_api, query_api_batch
 from wikiget.exceptions import ParseError
 from wikiget.logging import FileLogAdapter
 from wikiget.parse import get_dest, read_batch_file
@@ -36,11 +40,132 @@ from wikiget.validations import verify_hash
 
 if TYPE_CHECKING:
     from argparse import Namespace
+    from collections.abc import Iterator
+    from concurrent.futures import Future
+    from pathlib import Path
 
     from wikiget.file import File
 
 logger = logging.getLogger(__name__)
 
+# errors that connect_to_site and query_api may raise when a site can't be reached,
+# logged in to, or queried, or when it rejects a file name; they're logged where they
+# happen, so callers only need to count them
+SITE_ERRORS = (
+    ConnectionError,
+    HTTPError,
+    InvalidResponse,
+    LoginError,
+    APIError,
+    InvalidPageTitle,
+)
+
+
+class DownloadWriter:
+    """Wrap a binary file so that each write also updates a hash and progress bar.
+
+    Hashing the data as it's written means the file doesn't have to be read back from
+    disk afterwards to verify it.
+    """
+
+    def __init__(self, fd: IO[bytes], progress_bar: tqdm) -> None:
+        """Initialize a new writer for the given file and progress bar.
+
+        :param fd: binary file object to write to
+        :type fd: IO[bytes]
+        :param progress_bar: progress bar to update as data is written
+        :type progress_bar: tqdm.tqdm
+        """
+        self.fd = fd
+        self.progress_bar = progress_bar
+        self.hasher = hashlib.sha1()  # noqa: S324
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> int:
+        """Write the given data to the file and update the hash and progress bar.
+
+        :param data: bytes to write
+        :type data: bytes
+        :return: number of bytes written
+        :rtype: int
+        """
+        written = self.fd.write(data)
+        self.hasher.update(data)
+        self.bytes_written += written
+        self.progress_bar.update(written)
+        return written
+
+    def hexdigest(self) -> str:
+        """Return the SHA1 hash of everything written so far.
+
+        :return: hash digest
+        :rtype: str
+        """
+        return self.hasher.hexdigest()
+
+
+def preallocate(fd: IO[bytes], size: int) -> None:
+    """Reserve disk space for a file before it's written, where supported.
+
+    Allocating all of the space at once lets the filesystem keep the file contiguous
+    instead of extending it with every write.
+
+    :param fd: binary file object that will be written to
+    :type fd: IO[bytes]
+    :param size: expected size of the file in bytes
+    :type size: int
+    """
+    if size > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd.fileno(), 0, size)
+        except OSError as e:
+            # not all filesystems support this, but it's only an optimization
+            logger.debug("Unable to preallocate %s: %s", fd.name, e)
+
+
+def drop_cache(fd: IO[bytes], size: int) -> None:
+    """Advise the OS that a large file's cached pages won't be needed again.
+
+    Downloaded files aren't read back, so keeping them in the page cache would only push
+    out more useful data. Only pages that have already been written to disk can be
+    dropped, so the file's data has to be synced first, which blocks until the disk
+    catches up. That's only worth it for files of at least DROP_CACHE_MIN_SIZE bytes;
+    smaller files are left for the OS to write back and evict on its own.
+
+    :param fd: binary file object that has been written to
+    :type fd: IO[bytes]
+    :param size: size of the file in bytes
+    :type size: int
+    """
+    if size >= wikiget.DROP_CACHE_MIN_SIZE and hasattr(os, "posix_fadvise"):
+        fd.flush()
+        try:
+            os.fdatasync(fd.fileno())
+            os.posix_fadvise(fd.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError as e:
+            logger.debug("Unable to drop cached pages for %s: %s", fd.name, e)
+
+
+def is_current(dest: Path, size: int, sha1: str) -> bool:
+    """Check whether a local file is identical to the file on the site.
+
+    The file sizes are compared first, so that a file which can't possibly match doesn't
+    have to be read in full to calculate its hash.
+
+    :param dest: path to the local file
+    :type dest: pathlib.Path
+    :param size: size of the file on the site in bytes
+    :type size: int
+    :param sha1: SHA1 hash of the file on the site
+    :type sha1: str
+    :return: True if the local file exists and matches, False otherwise
+    :rtype: bool
+    """
+    try:
+        return dest.stat().st_size == size and verify_hash(dest) == sha1
+    except OSError:
+        return False
+
 
 def prep_download(dl: str, args: Namespace) -> File:
     """Prepare to download a file by parsing the filename or URL and CLI arguments.
@@ -56,7 +181,7 @@ def prep_download(dl: str, args: Namespace) -> File:
     file = get_dest(dl, args)
 
     # check if the destination file already exists; don't overwrite unless the user says
-    if file.dest.is_file() and not args.force:
+    if file.dest.is_file() and not (args.force or args.update):
         msg = f"[{file.dest}] File already exists; skipping download (use -f to force)"
         raise FileExistsError(msg)
 
@@ -105,7 +230,7 @@ def process_download(args: Namespace) -> int:
         except FileExistsError as e:
             logger.warning(e)
             exit_code = 1
-        except (ConnectionError, HTTPError, InvalidResponse, LoginError, APIError):
+        except SITE_ERRORS:
             exit_code = 1
         else:
             errors = download(file, args)
@@ -118,8 +243,10 @@ def batch_download(args: Namespace) -> int:
     """Download files specified in a batch file.
 
     The batch file is parsed into a dictionary, and the dictionary's items are checked
-    for validity before being downloaded using a ThreadPool for simultaneous downloads,
-    if threading was specified on the command line.
+    for validity, skipping any lines that are repeated. Image info for the valid files
+    is then requested from each site in as few API calls as possible, and each group of
+    files is handed to a ThreadPool for simultaneous downloads (if threading was
+    specified on the command line) as soon as its info arrives.
 
     :param args: command-line arguments and their values
     :type args: argparse.Namespace
@@ -128,62 +255,116 @@ def batch_download(args: Namespace) -> int:
     """
     errors = 0
 
-    # parse batch file
+    # parse every line up front (this doesn't need network access) so that image info
+    # for files hosted on the same site can be requested all at once
+    files: dict[int, File] = {}
+    seen: dict[str, int] = {}
     try:
-        dl_dict = read_batch_file(args.FILE)
-    except OSError as e:
-        logger.error("File could not be read: %s", str(e))
-        return 1
-
-    with ThreadPoolExecutor(max_workers=args.threads) as executor:
-        futures = []
-        sites: list[Site] = []
-        for line_num, line in dl_dict.items():
+        for line_num, line in read_batch_file(args.FILE):
             # keep track of batch file line numbers for debugging/logging purposes
             logger.info("Processing '%s' at line %i", line, line_num)
-            try:
-                file = prep_download(line, args)
-                site = next(
-                    filter(
-                        lambda site: site.host == file.site,
-                        sites,
-                    ),
-                    None,
+            # repeated lines would only download the same file again, so skip them
+            if line in seen:
+                logger.warning(
+                    "Skipping '%s' (line %i); duplicate of line %i",
+                    line,
+                    line_num,
+                    seen[line],
                 )
-                # if there's already a Site object matching the desired host, reuse it
-                # to reduce the number of API calls made per file
-                if site:
-                    logger.debug("Reusing the existing connection to %s", site.host)
-                else:
-                    logger.debug("Making a new connection to %s", file.site)
-                    site = connect_to_site(file.site, args)
-                    # cache the new Site for reuse
-                    sites.append(site)
-                file.image = query_api(file.name, site)
+                continue
+            seen[line] = line_num
+            try:
+                files[line_num] = prep_download(line, args)
             except ParseError as e:
                 logger.warning("%s (line %i)", str(e), line_num)
                 errors += 1
-                continue
             except FileExistsError as e:
                 logger.warning(e)
                 errors += 1
-                continue
-            except (ConnectionError, HTTPError, InvalidResponse, LoginError, APIError):
-                logger.warning(
-                    "Unable to download '%s' (line %i) due to an error",
-                    line,
-                    line_num,
-                )
-                errors += 1
-                continue
-            future = executor.submit(download, file, args)
-            futures.append(future)
+    except OSError as e:
+        logger.error("File could not be read: %s", str(e))
+        return 1
+    # map line numbers back to their contents for logging purposes
+    lines = {line_num: line for line, line_num in seen.items()}
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        futures: list[Future[int]] = []
+        # start downloading each group of files while the next group is looked up
+        for group in prefetch_image_info(files, args):
+            futures.extend(
+                executor.submit(batch_line, line_num, lines[line_num], file, args)
+                for line_num, file in group.items()
+            )
         # wait for downloads to finish
         for future in futures:
             errors += future.result()
     return errors
 
 
+def prefetch_image_info(
+    files: dict[int, File], args: Namespace
+) -> Iterator[dict[int, File]]:
+    """Request image info for the given files, grouped by the site hosting them.
+
+    Files are looked up in groups of up to QUERY_LIMIT per site, and each group is
+    yielded as soon as its info has been requested, so that downloads can begin before
+    every file has been looked up. The results are cached by query_api_batch, so later
+    calls to query_api for these files won't need to make their own API requests. Any
+    errors are left for the individual downloads to report.
+
+    :param files: File objects to request image info for, keyed by batch file line
+    :type files: dict[int, wikiget.file.File]
+    :param args: command-line arguments and their values
+    :type args: argparse.Namespace
+    :return: an iterator over groups of files whose image info has been requested
+    :rtype: Iterator[dict[int, wikiget.file.File]]
+    """
+    files_by_site: dict[str, dict[int, File]] = {}
+    for line_num, file in files.items():
+        files_by_site.setdefault(file.site, {})[line_num] = file
+
+    for site_name, site_files in files_by_site.items():
+        line_nums = list(site_files)
+        for i in range(0, len(line_nums), wikiget.QUERY_LIMIT):
+            group = {n: site_files[n] for n in line_nums[i : i + wikiget.QUERY_LIMIT]}
+            try:
+                site = connect_to_site(site_name, args)
+                query_api_batch([file.name for file in group.values()], site)
+            except SITE_ERRORS as e:
+                logger.debug("Unable to prefetch image info from %s: %s", site_name, e)
+            yield group
+
+
+def batch_line(line_num: int, line: str, file: File, args: Namespace) -> int:
+    """Look up and download a single file from a batch file.
+
+    :param line_num: line number in the batch file, for logging purposes
+    :type line_num: int
+    :param line: contents of the line (a filename or URL), for logging purposes
+    :type line: str
+    :param file: a File object representing the file to download
+    :type file: wikiget.file.File
+    :param args: command-line arguments and their values
+    :type args: argparse.Namespace
+    :return: number of errors encountered during processing
+    :rtype: int
+    """
+    try:
+        # connect_to_site reuses an existing Site for the same host, and query_api
+        # reuses image info fetched by prefetch_image_info, reducing the number of API
+        # calls made per file
+        site = connect_to_site(file.site, args)
+        file.image = query_api(file.name, site)
+    except SITE_ERRORS:
+        logger.warning(
+            "Unable to download '%s' (line %i) due to an error",
+            line,
+            line_num,
+        )
+        return 1
+    return download(file, args)
+
+
 def download(f: File, args: Namespace) -> int:
     """Fetch file information and contents if the file exists and save it to disk.
 
@@ -210,52 +391,117 @@ def download(f: File, args: Namespace) -> int:
         file_size = file.imageinfo["size"]
         file_sha1 = file.imageinfo["sha1"]
 
-        filename_log = f"Downloading '{filename}' ({file_size} bytes) from {site.host}"
         if args.output:
-            filename_log += f" to '{dest}'"
-        adapter.info(filename_log)
-        adapter.info(f"{file_url}")
+            adapter.info(
+                "Downloading '%s' (%i bytes) from %s to '%s'",
+                filename,
+                file_size,
+                site.host,
+                dest,
+            )
+        else:
+            adapter.info(
+                "Downloading '%s' (%i bytes) from %s", filename, file_size, site.host
+            )
+        adapter.info("%s", file_url)
 
         if args.dry_run:
             adapter.warning("Dry run; download skipped")
             return errors
 
+        if args.update and is_current(dest, file_size, file_sha1):
+            adapter.info("Local file is already up to date; skipping download")
+            return errors
+
+        # unless overwriting was requested, open the file in exclusive mode, so that if
+        # it was created after prep_download checked for it (e.g. by another thread
+        # downloading a duplicate batch file line), the open fails instead of two
+        # downloads writing to the same file
+        mode = "wb" if args.force or args.update else "xb"
         try:
-            with tqdm(
+            with dest.open(mode) as fd, tqdm(
                 desc=str(dest),
                 leave=args.verbose >= wikiget.STD_VERBOSE,
                 total=file_size,
                 unit="B",
                 unit_scale=True,
                 unit_divisor=wikiget.CHUNKSIZE,
-            ) as progress_bar, dest.open("wb") as fd:
-                # download the file using the existing Site session
-                res = site.connection.get(file_url, stream=True)
-                for chunk in res.iter_content(wikiget.CHUNKSIZE):
-                    fd.write(chunk)
-                    progress_bar.update(len(chunk))
-        except OSError as e:
-            adapter.error(f"File could not be written: {e}")
+            ) as progress_bar:
+                writer = DownloadWriter(fd, progress_bar)
+                # download the file using the existing Site session; media files are
+                # almost always compressed already, so don't ask for them to be
+                # compressed again in transit (the response is closed even if writing
+                # fails, since the session's connection pool blocks when it runs out of
+                # connections)
+                with site.connection.get(
+                    file_url, stream=True, headers={"Accept-Encoding": "identity"}
+                ) as res:
+                    # let urllib3 undo any transfer encoding, then copy the raw stream
+                    # to disk in large blocks instead of iterating over small chunks;
+                    # this also keeps the number of progress bar updates per file low
+                    # (reading into a reused buffer wouldn't save anything here, since
+                    # urllib3's readinto is implemented as a read followed by a copy)
+                    res.raw.decode_content = True
+                    preallocate(fd, file_size)
+                    try:
+                        shutil.copyfileobj(res.raw, writer, wikiget.DOWNLOAD_BLOCKSIZE)
+                    finally:
+                        # if the download was cut short, don't leave the rest of the
+                        # preallocated space at the end of the file
+                        fd.truncate()
+                drop_cache(fd, writer.bytes_written)
+        except FileExistsError:
+            adapter.warning("File already exists; skipping download (use -f to force)")
+            errors += 1
+            return errors
+        except urllib3.exceptions.ProtocolError as e:
+            # urllib3 enforces Content-Length, so a connection that drops partway
+            # through surfaces here (as IncompleteRead) rather than as a short file; the
+            # data from the failed read never reaches the writer, so take the number of
+            # bytes received from the error where it's available
+            received = writer.bytes_written
+            for arg in e.args:
+                if isinstance(arg, urllib3.exceptions.IncompleteRead):
+                    received = arg.partial
+            adapter.error(
+                "Size mismatch! Expected %i bytes but received %i. "
+                "Download may have been interrupted.",
+                file_size,
+                received,
+            )
+            adapter.debug("%s", e)
+            errors += 1
+            return errors
+        except (OSError, urllib3.exceptions.HTTPError) as e:
+            # reading res.raw directly bypasses requests' exception handling, so urllib3
+            # errors (e.g. a read that times out partway through) arrive unwrapped
+            adapter.error("File could not be written: %s", e)
             errors += 1
             return errors
 
-        # verify file integrity and log the details
-        try:
-            dl_sha1 = verify_hash(dest)
-        except OSError as e:
-            adapter.error(f"File downloaded but could not be verified: {e}")
+        # the server sent a complete response that doesn't match the size given in the
+        # image info, so report it as such rather than as a hash mismatch
+        if writer.bytes_written != file_size:
+            adapter.error(
+                "Size mismatch! Expected %i bytes but received %i.",
+                file_size,
+                writer.bytes_written,
+            )
             errors += 1
             return errors
 
-        adapter.info(f"Remote file SHA1 is {file_sha1}")
-        adapter.info(f"Local file SHA1 is {dl_sha1}")
+        # verify file integrity using the hash computed during download and log the
+        # details
+        dl_sha1 = writer.hexdigest()
+        adapter.info("Remote file SHA1 is %s", file_sha1)
+        adapter.info("Local file SHA1 is %s", dl_sha1)
         if dl_sha1 == file_sha1:
             adapter.info("Hashes match!")
             # at this point, we've successfully downloaded the file
-            success_log = f"'{filename}' downloaded"
             if args.output:
-                success_log += f" to '{dest}'"
-            adapter.info(success_log)
+                adapter.info("'%s' downloaded to '%s'", filename, dest)
+            else:
+                adapter.info("'%s' downloaded", filename)
         else:
             adapter.error("Hash mismatch! Downloaded file may be corrupt.")
             errors += 1
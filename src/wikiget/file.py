@@ -19,6 +19,7 @@
 
 from __future__ import annotations
 
+import sys
 from pathlib import Path
 from typing import TYPE_CHECKING
 
@@ -31,6 +32,10 @@ if TYPE_CHECKING:
 class File:
     """A file object."""
 
+    # batch downloads create a File for every line, so don't give each one a __dict__;
+    # __str__ lists the attributes in this order, so it's kept instead of being sorted
+    __slots__ = ("name", "dest", "site", "image")  # noqa: RUF023
+
     def __init__(
         self, name: str, dest: str = "", site: str = "", image: Image = None
     ) -> None:
@@ -52,7 +57,9 @@ class File:
         """
         self.name = name
         self.dest = Path(dest) if dest else Path(name)
-        self.site = site if site else DEFAULT_SITE
+        # files in a batch usually come from only a few sites, so share one copy of each
+        # site name (sites parsed from URLs would otherwise each get their own string)
+        self.site = sys.intern(site) if site else DEFAULT_SITE
         self.image = image
 
     def __eq__(self, other: object) -> bool:
@@ -65,11 +72,11 @@ class File:
         """
         if not isinstance(other, File):
             return NotImplemented
-        return (
-            self.name == other.name
-            and self.dest == other.dest
-            and self.site == other.site
-            and self.image == other.image
+        return (self.name, self.dest, self.site, self.image) == (
+            other.name,
+            other.dest,
+            other.site,
+            other.image,
         )
 
     def __str__(self) -> str:
@@ -78,7 +85,7 @@ class File:
         :return: string form of the class
         :rtype: str
         """
-        return str(self.__dict__)
+        return str({attr: getattr(self, attr) for attr in self.__slots__})
 
     def __repr__(self) -> str:
         """Return a formal string representation of this class, for repr().
@@ -86,9 +93,7 @@ class File:
         :return: string form of the class
         :rtype: str
         """
-        attr_list = [self.name, self.dest, self.site]
-        return '{}("{}", {})'.format(
-            self.__class__.__name__,
-            '", "'.join(map(str, attr_list)),
-            self.image,
+        return (
+            f'{self.__class__.__name__}("{self.name}", "{self.dest}", "{self.site}", '
+            f"{self.image!r})"
         )
@@ -20,16 +20,29 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, MutableMapping
+from typing import Any
 
 import wikiget
 
+CONSOLE_FORMATTER = logging.Formatter("[%(levelname)s] %(message)s")
+FILE_FORMATTER = logging.Formatter("%(asctime)s [%(levelname)-7s] %(message)s")
+
+# handlers added by configure_logging, so that calling it again replaces them instead of
+# sending every message to the console (or logfile) more than once
+_handlers: list[logging.Handler] = []
+
 
 class FileLogAdapter(logging.LoggerAdapter):
-    def process(
-        self, msg: Any, kwargs: MutableMapping[str, Any]
-    ) -> tuple[str, MutableMapping[str, Any]]:
-        return f"[{self.extra['filename']}] {msg}", kwargs
+    def log(self, level: int, msg: Any, *args: Any, **kwargs: Any) -> None:
+        if self.isEnabledFor(level):
+            prefix = str(self.extra["filename"])
+            if args:
+                # the prefix becomes part of the format string, so escape any "%"
+                # characters in the filename to keep them from being treated as
+                # placeholders (messages without args aren't formatted at all)
+                prefix = prefix.replace("%", "%%")
+            msg = f"[{prefix}] {msg}"
+            self.logger.log(level, msg, *args, **kwargs)
 
 
 def configure_logging(verbosity: int, logfile: str, *, quiet: bool) -> None:
@@ -54,21 +67,28 @@ def configure_logging(verbosity: int, logfile: str, *, quiet: bool) -> None:
     # configure logging:
     # console log level is set via -v, -vv, and -q options;
     # file log level is always debug (TODO: make this user configurable)
-    console_log_format = "[%(levelname)s] %(message)s"
-    file_log_format = "%(asctime)s [%(levelname)-7s] %(message)s"
-
     logger = logging.getLogger("")  # root logger
-    logger.setLevel(logging.DEBUG)
+    # don't create records that every handler would discard anyway; this also lets
+    # FileLogAdapter skip adding its prefix to messages that won't be shown
+    logger.setLevel(logging.DEBUG if logfile else loglevel)
+
+    # remove any handlers left over from a previous call
+    for handler in _handlers:
+        logger.removeHandler(handler)
+        handler.close()
+    _handlers.clear()
 
     # set up console logging
     ch = logging.StreamHandler()
     ch.setLevel(loglevel)
-    ch.setFormatter(logging.Formatter(console_log_format))
+    ch.setFormatter(CONSOLE_FORMATTER)
     logger.addHandler(ch)
+    _handlers.append(ch)
 
     if logfile:
         # also log to file
         fh = logging.FileHandler(logfile)
         fh.setLevel(logging.DEBUG)
-        fh.setFormatter(logging.Formatter(file_log_format))
+        fh.setFormatter(FILE_FORMATTER)
         logger.addHandler(fh)
+        _handlers.append(fh)
@@ -19,18 +19,20 @@
 
 from __future__ import annotations
 
-import fileinput
 import logging
+import sys
+from pathlib import Path
 from typing import TYPE_CHECKING
 from urllib.parse import unquote, urlparse
 
 import wikiget
 from wikiget.exceptions import ParseError
 from wikiget.file import File
-from wikiget.validations import valid_file
+from wikiget.validations import VALID_FILE_RE
 
 if TYPE_CHECKING:
     from argparse import Namespace
+    from collections.abc import Iterator
 
 logger = logging.getLogger(__name__)
 
@@ -46,9 +48,11 @@ def get_dest(dl: str, args: Namespace) -> File:
     :return: a File object representing the target, destination, and site
     :rtype: wikiget.file.File
     """
-    url = urlparse(dl)
+    # a URL can only have a host if it contains "//", so don't bother parsing plain
+    # filenames (the usual case in batch files) as URLs
+    url = urlparse(dl) if "//" in dl else None
 
-    if url.netloc:
+    if url and url.netloc:
         filename = url.path
         site_name = url.netloc
         if args.site is not wikiget.DEFAULT_SITE:
@@ -59,7 +63,7 @@ def get_dest(dl: str, args: Namespace) -> File:
         filename = dl
         site_name = args.site
 
-    file_match = valid_file(filename)
+    file_match = VALID_FILE_RE.search(filename)
 
     # check if this is a valid file
     if file_match and file_match.group(1):
@@ -75,30 +79,33 @@ def get_dest(dl: str, args: Namespace) -> File:
     return File(filename, dest, site_name)
 
 
-def read_batch_file(batch_file: str) -> dict[int, str]:
+def read_batch_file(batch_file: str) -> Iterator[tuple[int, str]]:
     """Parse a batch file or stdin for valid input.
 
-    The contents are returned as a dictionary with line numbers for keys and line
-    contents for values. Any blank lines or lines starting with '#' are skipped.
+    The contents are yielded one line at a time as tuples of line numbers and line
+    contents, so the whole file never has to be held in memory. Any blank lines or lines
+    starting with '#' are skipped.
 
     :param batch_file: name of the file to parse or "-" for stdin
     :type batch_file: str
-    :return: a dictionary representation of the input contents
-    :rtype: dict[int, str]
+    :return: an iterator over the line numbers and contents of the input
+    :rtype: Iterator[tuple[int, str]]
     """
-    dl_dict = {}
-
+    # read the file directly rather than through fileinput, which adds overhead to every
+    # line for features that aren't needed here
     if batch_file == "-":
         logger.info("Using stdin for batch download")
+        fd = sys.stdin
     else:
         logger.info("Using file '%s' for batch download", batch_file)
+        fd = Path(batch_file).open()
 
-    with fileinput.input(batch_file) as fd:
-        # read the file into memory and process each line as we go
+    try:
         for line_num, line in enumerate(fd, start=1):
             line_s = line.strip()
             # ignore blank lines and lines starting with "#" (for comments)
             if line_s and not line_s.startswith("#"):
-                dl_dict[line_num] = line_s
-
-    return dl_dict
+                yield line_num, line_s
+    finally:
+        if fd is not sys.stdin:
+            fd.close()
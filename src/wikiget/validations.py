@@ -21,6 +21,7 @@ from __future__ import annotations
 
 import hashlib
 import re
+import sys
 from typing import TYPE_CHECKING
 
 from wikiget import BLOCKSIZE
@@ -28,6 +29,12 @@ from wikiget import BLOCKSIZE
 if TYPE_CHECKING:
     from pathlib import Path
 
+# compiled once here rather than on every call, since the file pattern is checked for
+# every download target; second group could also restrict to file extensions with
+# three or more letters with ([^/\r\n\t\f\v]+\.\w{3,})
+VALID_FILE_RE = re.compile(r"(File:|Image:)([^/\r\n\t\f\v]+\.\w+)$", re.I)
+VALID_SITE_RE = re.compile(r"wiki[mp]edia\.org$", re.I)
+
 
 def valid_file(search_string: str) -> re.Match | None:
     """Determine if the given string contains a valid file name.
@@ -41,10 +48,7 @@ def valid_file(search_string: str) -> re.Match | None:
     :returns: a regex Match object if there's a match or None otherwise
     :rtype: re.Match
     """
-    # second group could also restrict to file extensions with three or more
-    # letters with ([^/\r\n\t\f\v]+\.\w{3,})
-    file_regex = re.compile(r"(File:|Image:)([^/\r\n\t\f\v]+\.\w+)$", re.I)
-    return file_regex.search(search_string)
+    return VALID_FILE_RE.search(search_string)
 
 
 def valid_site(search_string: str) -> re.Match | None:
@@ -61,8 +65,7 @@ def valid_site(search_string: str) -> re.Match | None:
     :returns: a regex Match object if there's a match or None otherwise
     :rtype: re.Match
     """
-    site_regex = re.compile(r"wiki[mp]edia\.org$", re.I)
-    return site_regex.search(search_string)
+    return VALID_SITE_RE.search(search_string)
 
 
 def verify_hash(file: Path) -> str:
@@ -71,15 +74,25 @@ def verify_hash(file: Path) -> str:
     Despite being insecure, SHA1 is used since that's what the MediaWiki API returns for
     the file hash.
 
+    On Python 3.11 and later, hashlib.file_digest is used so that the read loop runs in
+    C with the GIL released.
+
     :param filename: name of the file to calculate a hash for
     :type filename: str
     :return: hash digest
     :rtype: str
     """
-    hasher = hashlib.sha1()  # noqa: S324
     with file.open("rb") as dl:
-        buf = dl.read(BLOCKSIZE)
-        while len(buf) > 0:
-            hasher.update(buf)
-            buf = dl.read(BLOCKSIZE)
+        if sys.version_info >= (3, 11):
+            return hashlib.file_digest(dl, "sha1").hexdigest()
+
+        # read into the same buffer each time instead of allocating a new bytes object
+        # for every block, as file_digest does
+        hasher = hashlib.sha1()  # noqa: S324
+        buf = bytearray(BLOCKSIZE)
+        view = memoryview(buf)
+        size = dl.readinto(buf)
+        while size:
+            hasher.update(view[:size])
+            size = dl.readinto(buf)
     return hasher.hexdigest()
@@ -24,7 +24,6 @@ import logging
 import sys
 
 import wikiget
-from wikiget.dl import process_download
 from wikiget.logging import configure_logging
 
 
@@ -76,6 +75,12 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
     parser.add_argument(
         "-f", "--force", help="force overwriting existing files", action="store_true"
     )
+    parser.add_argument(
+        "-U",
+        "--update",
+        help="overwrite existing files only if they differ from the file on the site",
+        action="store_true",
+    )
     parser.add_argument(
         "-s",
         "--site",
@@ -139,7 +144,13 @@ def cli() -> int:
     # log events are appended to the file if it already exists, so note the start of a
     # new download session
     logger.info("Starting download session using wikiget %s", wikiget.__version__)
-    logger.debug("User agent: %s", wikiget.USER_AGENT)
+    if logger.isEnabledFor(logging.DEBUG):
+        # getting the user agent imports mwclient, so only do it if it'll be logged
+        logger.debug("User agent: %s", wikiget.get_user_agent())
+
+    # wikiget.dl imports mwclient and requests, which are slow to import, so wait until
+    # the arguments have been parsed (and --help or --version handled) before loading it
+    from wikiget.dl import process_download  # noqa: PLC0415
 
     try:
         exit_code = process_download(args)
@@ -19,6 +19,7 @@
 
 from __future__ import annotations
 
+import logging
 from typing import TYPE_CHECKING
 
 import pytest
@@ -26,6 +27,7 @@ import pytest
 from wikiget.file import File
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from pathlib import Path
 
     import requests_mock as rm
@@ -56,6 +58,19 @@ def _chdir_to_tmp_dir(
     monkeypatch.chdir(tmp_path_factory.getbasetemp())
 
 
+@pytest.fixture(autouse=True)
+def _restore_root_log_level() -> Iterator[None]:
+    """Restore the root logger's level after each test.
+
+    configure_logging sets the root logger's level to match the requested verbosity,
+    which would otherwise carry over into later tests.
+    """
+    root_logger = logging.getLogger()
+    level = root_logger.level
+    yield
+    root_logger.setLevel(level)
+
+
 @pytest.fixture(scope="session")
 def batch_file(tmp_path_factory: pytest.TempPathFactory) -> Path:
     """Create a temporary batch file for testing.
@@ -20,14 +20,15 @@
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch, sentinel
 
 import pytest
-from mwclient import APIError, InvalidResponse
-from requests import ConnectionError, HTTPError
+from mwclient import APIError, InvalidPageTitle, InvalidResponse
+from requests import ConnectionError, HTTPError, Session
 
-from wikiget import DEFAULT_SITE
-from wikiget.client import connect_to_site, query_api
+from wikiget import DEFAULT_SITE, QUERY_LIMIT
+from wikiget.client import connect_to_site, query_api, query_api_batch
 from wikiget.wikiget import parse_args
 
 
@@ -38,6 +39,15 @@ class TestConnectSite:
     # defined here for ease of maintenance
     info_msg = f"Connecting to {DEFAULT_SITE}"
 
+    @pytest.fixture(autouse=True)
+    def _empty_site_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Start each test with no cached Site objects.
+
+        :param monkeypatch: Pytest monkeypatch helper
+        :type monkeypatch: pytest.MonkeyPatch
+        """
+        monkeypatch.setattr("wikiget.client._site_cache", {})
+
     def test_connect_to_site(self, caplog: pytest.LogCaptureFixture) -> None:
         """Test that an info log message is created with the name of the site."""
         caplog.set_level(logging.INFO)
@@ -70,6 +80,65 @@ class TestConnectSite:
             "Attempting to authenticate with credentials",
         )
 
+    def test_connect_to_site_pool_size(self) -> None:
+        """Test that the connection pool is large enough for the number of threads."""
+        args = parse_args(["-a", "-j", "16", "batch.txt"])
+
+        with patch("wikiget.client.Site") as mock_site:
+            mock_site.return_value.connection = Session()
+            site = connect_to_site(DEFAULT_SITE, args)
+
+        adapter = site.connection.get_adapter("https://upload.wikimedia.org/")
+        assert adapter._pool_maxsize == 16
+
+    def test_connect_to_site_reuse_site(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that an existing Site object is reused for the same site."""
+        caplog.set_level(logging.DEBUG)
+        args = parse_args(["File:Example.jpg"])
+
+        with patch("wikiget.client.Site") as mock_site:
+            first_site = connect_to_site(DEFAULT_SITE, args)
+            second_site = connect_to_site(DEFAULT_SITE, args)
+
+        assert mock_site.call_count == 1
+        assert first_site is second_site
+        assert caplog.record_tuples == [
+            ("wikiget.client", logging.INFO, self.info_msg),
+            (
+                "wikiget.client",
+                logging.DEBUG,
+                f"Reusing the existing connection to {DEFAULT_SITE}",
+            ),
+        ]
+
+    def test_connect_to_site_login_once(self) -> None:
+        """Test that concurrent callers share a single login to the same site."""
+        args = parse_args(["-u", "username", "-p", "password", "-a", "batch.txt"])
+
+        with patch("wikiget.client.Site") as mock_site, ThreadPoolExecutor(
+            max_workers=4
+        ) as executor:
+            sites = list(
+                executor.map(lambda _: connect_to_site(DEFAULT_SITE, args), range(8))
+            )
+
+        assert mock_site.call_count == 1
+        mock_site.return_value.login.assert_called_once_with("username", "password")
+        assert all(site is sites[0] for site in sites)
+
+    def test_connect_to_site_error_not_cached(self) -> None:
+        """Test that a failed connection is retried on the next call."""
+        args = parse_args(["File:Example.jpg"])
+
+        new_site = MagicMock()
+        with patch("wikiget.client.Site") as mock_site:
+            mock_site.side_effect = [ConnectionError, new_site]
+            with pytest.raises(ConnectionError):
+                _ = connect_to_site(DEFAULT_SITE, args)
+            site = connect_to_site(DEFAULT_SITE, args)
+
+        assert site is new_site
+
     def test_connect_to_site_connection_error(
         self, caplog: pytest.LogCaptureFixture
     ) -> None:
@@ -153,6 +222,31 @@ class TestQueryApi:
 
         assert image == sentinel.mock_image
 
+    def test_query_api_reuse_image(self) -> None:
+        """Test that querying the same file twice only makes one API request."""
+        mock_site = MagicMock()
+        mock_site.images.__getitem__.return_value = sentinel.mock_image
+
+        first_image = query_api("Example.jpg", mock_site)
+        second_image = query_api("Example.jpg", mock_site)
+
+        assert mock_site.images.__getitem__.call_count == 1
+        assert first_image is second_image
+
+    def test_query_api_error_not_cached(self) -> None:
+        """Test that a failed query is retried on the next call."""
+        mock_site = MagicMock()
+        mock_site.images.__getitem__.side_effect = [
+            APIError("error code", "error info", "error kwargs"),
+            sentinel.mock_image,
+        ]
+
+        with pytest.raises(APIError):
+            _ = query_api("Example.jpg", mock_site)
+        image = query_api("Example.jpg", mock_site)
+
+        assert image == sentinel.mock_image
+
     def test_query_api_error(self, caplog: pytest.LogCaptureFixture) -> None:
         """Test that the correct log messages are created when APIError is raised.
 
@@ -185,3 +279,101 @@ class TestQueryApi:
             ("wikiget.client", logging.DEBUG, "error info"),
             ("wikiget.client", logging.DEBUG, "error kwargs"),
         ]
+
+    def test_query_api_invalid(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that an error is logged if the site rejects the filename."""
+        mock_site = MagicMock()
+        mock_site.images.__getitem__.side_effect = InvalidPageTitle(
+            "The requested page title contains invalid characters"
+        )
+
+        with pytest.raises(InvalidPageTitle):
+            _ = query_api("Foo<bar>.jpg", mock_site)
+
+        assert caplog.record_tuples == [
+            (
+                "wikiget.client",
+                logging.ERROR,
+                (
+                    "Invalid file name: The requested page title contains invalid "
+                    "characters"
+                ),
+            ),
+        ]
+
+
+class TestQueryApiBatch:
+    """Define tests related to wikiget.client.query_api_batch."""
+
+    @pytest.fixture()
+    def mock_site(self) -> MagicMock:
+        """Create a mock Site that answers imageinfo queries for any title.
+
+        Every title is returned in normalized form (with its first letter capitalized)
+        and with fake image info.
+
+        :return: mock Site object
+        :rtype: unittest.mock.MagicMock
+        """
+
+        def fake_query(*_: str, titles: str, **__: str) -> dict:
+            normalized = []
+            pages = {}
+            for i, title in enumerate(titles.split("|")):
+                norm_title = title[:5] + title[5].upper() + title[6:]
+                if norm_title != title:
+                    normalized.append({"from": title, "to": norm_title})
+                pages[str(i)] = {
+                    "ns": 6,
+                    "title": norm_title,
+                    "imageinfo": [{"url": f"https://example.org/{norm_title}"}],
+                }
+            return {"query": {"normalized": normalized, "pages": pages}}
+
+        site = MagicMock()
+        site.namespaces = {6: "File"}
+        site.get.side_effect = fake_query
+        return site
+
+    def test_query_api_batch(self, mock_site: MagicMock) -> None:
+        """Test that Images are returned for each filename using a single request."""
+        images = query_api_batch(["example.jpg", "Foo.jpg"], mock_site)
+
+        assert mock_site.get.call_count == 1
+        assert list(images) == ["example.jpg", "Foo.jpg"]
+        assert images["example.jpg"].name == "File:Example.jpg"
+        assert images["example.jpg"].imageinfo == {
+            "url": "https://example.org/File:Example.jpg"
+        }
+
+    def test_query_api_batch_limit(self, mock_site: MagicMock) -> None:
+        """Test that no more than QUERY_LIMIT titles are requested at once."""
+        filenames = [f"Example{i}.jpg" for i in range(QUERY_LIMIT + 1)]
+
+        images = query_api_batch(filenames, mock_site)
+
+        assert mock_site.get.call_count == 2
+        assert len(images) == QUERY_LIMIT + 1
+
+    def test_query_api_batch_cached(self, mock_site: MagicMock) -> None:
+        """Test that query_api reuses Images retrieved by query_api_batch."""
+        images = query_api_batch(["Example.jpg"], mock_site)
+        image = query_api("Example.jpg", mock_site)
+
+        assert image is images["Example.jpg"]
+        assert not mock_site.images.__getitem__.called
+
+    def test_query_api_batch_invalid(self, mock_site: MagicMock) -> None:
+        """Test that files with names the site rejects are left out of the results."""
+        fake_query = mock_site.get.side_effect
+
+        def invalid_query(*args: str, titles: str, **kwargs: str) -> dict:
+            result = fake_query(*args, titles=titles, **kwargs)
+            result["query"]["pages"]["0"]["invalid"] = ""
+            return result
+
+        mock_site.get.side_effect = invalid_query
+
+        images = query_api_batch(["Foo<bar>.jpg", "Example.jpg"], mock_site)
+
+        assert list(images) == ["Example.jpg"]
@@ -20,21 +20,34 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import TYPE_CHECKING, Any
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 import requests
-from mwclient import Site
-
-from wikiget.dl import batch_download, download, prep_download, process_download
+from mwclient import InvalidPageTitle, Site
+
+from wikiget import DEFAULT_SITE, DROP_CACHE_MIN_SIZE, QUERY_LIMIT
+from wikiget.dl import (
+    batch_download,
+    download,
+    drop_cache,
+    prefetch_image_info,
+    prep_download,
+    process_download,
+)
 from wikiget.exceptions import ParseError
 from wikiget.file import File
 from wikiget.wikiget import parse_args
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from pathlib import Path
 
+    import requests_mock as rm
+
 
 class TestPrepDownload:
     """Define tests related to wikiget.dl.prep_download."""
@@ -58,6 +71,13 @@ class TestPrepDownload:
         with pytest.raises(FileExistsError):
             _ = prep_download(args.FILE, args)
 
+    def test_prep_download_update_existing_file(self, test_file: Path) -> None:
+        """Test that an existing download file is allowed when updating."""
+        args = parse_args(["-U", "File:Example.jpg", "-o", str(test_file)])
+        file = prep_download(args.FILE, args)
+
+        assert file.dest == test_file
+
 
 class TestProcessDownload:
     """Define tests related to wikiget.dl.process_download."""
@@ -179,7 +199,7 @@ class TestBatchDownload:
         caplog.set_level(logging.INFO)
 
         # set dummy return values for read_batch_file() and download()
-        mock_read_batch_file.return_value = {1: "File:Example.jpg"}
+        mock_read_batch_file.return_value = iter([(1, "File:Example.jpg")])
         mock_download.return_value = 0
 
         args = parse_args(["-a", "batch.txt"])
@@ -195,50 +215,44 @@ class TestBatchDownload:
         ]
         assert errors == 0
 
-    @patch("wikiget.dl.connect_to_site")
-    @patch("wikiget.dl.prep_download")
-    def test_batch_download_reuse_site(
+    @patch("wikiget.dl.batch_line")
+    def test_batch_download_duplicate_line(
         self,
-        mock_prep_download: MagicMock,
-        mock_connect_to_site: MagicMock,
+        mock_batch_line: MagicMock,
         mock_read_batch_file: MagicMock,
         caplog: pytest.LogCaptureFixture,
     ) -> None:
-        """Test that an existing site object is reused."""
-        caplog.set_level(logging.DEBUG)
-
-        mock_site = MagicMock()
-        mock_site.host = "commons.wikimedia.org"
-        mock_read_batch_file.return_value = {
-            1: "File:Example.jpg",
-            2: "File:Foobar.jpg",
-        }
-        mock_prep_download.return_value = File("Example.jpg")
-        mock_connect_to_site.return_value = mock_site
+        """Test that repeated lines in the batch file are only downloaded once."""
+        mock_read_batch_file.return_value = iter(
+            [(1, "File:Example.jpg"), (2, "File:Example.jpg")]
+        )
+        mock_batch_line.return_value = 0
 
         args = parse_args(["-a", "batch.txt"])
-        with patch("wikiget.dl.download"), patch("wikiget.dl.query_api"):
-            _ = batch_download(args)
+        with patch("wikiget.dl.connect_to_site"), patch("wikiget.dl.query_api_batch"):
+            errors = batch_download(args)
 
-        assert mock_read_batch_file.called
-        assert mock_prep_download.called
-        assert mock_connect_to_site.called
-        assert caplog.record_tuples[1] == (
-            "wikiget.dl",
-            logging.DEBUG,
-            "Making a new connection to commons.wikimedia.org",
-        )
-        assert caplog.record_tuples[3] == (
-            "wikiget.dl",
-            logging.DEBUG,
-            "Reusing the existing connection to commons.wikimedia.org",
-        )
+        assert mock_batch_line.call_count == 1
+        assert caplog.record_tuples == [
+            (
+                "wikiget.dl",
+                logging.WARNING,
+                "Skipping 'File:Example.jpg' (line 2); duplicate of line 1",
+            ),
+        ]
+        assert errors == 0
 
     def test_batch_download_os_error(
         self, mock_read_batch_file: MagicMock, caplog: pytest.LogCaptureFixture
     ) -> None:
-        """Test that an OSError results in an error log message and program exit."""
-        mock_read_batch_file.side_effect = OSError("error message")
+        """Test that an OSError results in an error log message and program exit.
+
+        Since the batch file is read lazily, the error is raised while iterating over
+        its lines rather than when read_batch_file is called.
+        """
+        mock_read_batch_file.return_value.__iter__.side_effect = OSError(
+            "error message"
+        )
 
         args = parse_args(["-a", "batch.txt"])
         errors = batch_download(args)
@@ -261,7 +275,7 @@ class TestBatchDownload:
         The resulting log message should contain the relevant line where the problem
         ocurred.
         """
-        mock_read_batch_file.return_value = {1: "File:Example.jpg"}
+        mock_read_batch_file.return_value = iter([(1, "File:Example.jpg")])
         mock_prep_download.side_effect = ParseError("warning message")
 
         args = parse_args(["-a", "batch.txt"])
@@ -282,7 +296,7 @@ class TestBatchDownload:
         caplog: pytest.LogCaptureFixture,
     ) -> None:
         """Test that a warning log message is created if the download file exists."""
-        mock_read_batch_file.return_value = {1: "File:Example.jpg"}
+        mock_read_batch_file.return_value = iter([(1, "File:Example.jpg")])
         mock_prep_download.side_effect = FileExistsError("warning message")
 
         args = parse_args(["-a", "batch.txt"])
@@ -295,10 +309,29 @@ class TestBatchDownload:
         ]
         assert errors == 1
 
-    @patch("wikiget.dl.prep_download")
+    @patch("wikiget.dl.query_api")
+    @patch("wikiget.dl.connect_to_site")
+    def test_batch_download_existing_file_no_network(
+        self,
+        mock_connect_to_site: MagicMock,
+        mock_query_api: MagicMock,
+        mock_read_batch_file: MagicMock,
+        test_file: Path,
+    ) -> None:
+        """Test that files already on disk are skipped without contacting the site."""
+        mock_read_batch_file.return_value = iter([(1, f"File:{test_file.name}")])
+
+        args = parse_args(["-a", "batch.txt"])
+        errors = batch_download(args)
+
+        assert not mock_connect_to_site.called
+        assert not mock_query_api.called
+        assert errors == 1
+
+    @patch("wikiget.dl.connect_to_site")
     def test_batch_download_other_error(
         self,
-        mock_prep_download: MagicMock,
+        mock_connect_to_site: MagicMock,
         mock_read_batch_file: MagicMock,
         caplog: pytest.LogCaptureFixture,
     ) -> None:
@@ -307,14 +340,14 @@ class TestBatchDownload:
         The log message should also contain the line number and contents of the line
         that caused the error.
         """
-        mock_read_batch_file.return_value = {1: "File:Example.jpg"}
-        mock_prep_download.side_effect = requests.ConnectionError
+        mock_read_batch_file.return_value = iter([(1, "File:Example.jpg")])
+        mock_connect_to_site.side_effect = requests.ConnectionError
 
         args = parse_args(["-a", "batch.txt"])
         errors = batch_download(args)
 
         assert mock_read_batch_file.called
-        assert mock_prep_download.called
+        assert mock_connect_to_site.called
         assert caplog.record_tuples == [
             (
                 "wikiget.dl",
@@ -324,37 +357,144 @@ class TestBatchDownload:
         ]
         assert errors == 1
 
+    @patch("wikiget.dl.download")
+    @patch("wikiget.dl.connect_to_site")
+    def test_batch_download_invalid_title(
+        self,
+        mock_connect_to_site: MagicMock,
+        mock_download: MagicMock,
+        mock_read_batch_file: MagicMock,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        """Test that a file name the site rejects doesn't stop the rest of the batch."""
+        mock_read_batch_file.return_value = iter(
+            [(1, "File:Foo<bar>.jpg"), (2, "File:Example.jpg")]
+        )
+        site = mock_connect_to_site.return_value
+        site.namespaces = {6: "File"}
+        site.get.return_value = {
+            "query": {
+                "pages": {
+                    "-1": {"title": "File:Foo<bar>.jpg", "invalid": ""},
+                    "1": {"ns": 6, "title": "File:Example.jpg", "imageinfo": [{}]},
+                }
+            }
+        }
+        site.images.__getitem__.side_effect = InvalidPageTitle("invalid characters")
+        mock_download.return_value = 0
+
+        args = parse_args(["-a", "batch.txt"])
+        errors = batch_download(args)
+
+        assert mock_download.call_count == 1
+        assert (
+            "wikiget.dl",
+            logging.WARNING,
+            "Unable to download 'File:Foo<bar>.jpg' (line 1) due to an error",
+        ) in caplog.record_tuples
+        assert errors == 1
+
+
+class TestPrefetchImageInfo:
+    """Define tests related to wikiget.dl.prefetch_image_info."""
+
+    def test_prefetch_image_info_groups(self) -> None:
+        """Test that files are looked up and yielded in groups of QUERY_LIMIT.
+
+        Each group should be yielded before the next one is requested, so that
+        downloads can start while the remaining files are looked up.
+        """
+        args = parse_args(["-a", "batch.txt"])
+        files = {
+            n: File(f"Example{n}.jpg", site=DEFAULT_SITE)
+            for n in range(1, QUERY_LIMIT + 2)
+        }
+
+        with patch("wikiget.dl.connect_to_site"), patch(
+            "wikiget.dl.query_api_batch"
+        ) as mock_query_api_batch:
+            groups = prefetch_image_info(files, args)
+            first_group = next(groups)
+
+            assert mock_query_api_batch.call_count == 1
+            assert list(first_group) == list(range(1, QUERY_LIMIT + 1))
+            assert list(next(groups)) == [QUERY_LIMIT + 1]
+            assert mock_query_api_batch.call_count == 2
+
+    @patch("wikiget.dl.query_api_batch")
+    @patch("wikiget.dl.connect_to_site")
+    def test_prefetch_image_info_error(
+        self, mock_connect_to_site: MagicMock, mock_query_api_batch: MagicMock
+    ) -> None:
+        """Test that files are still yielded if their image info can't be requested."""
+        mock_connect_to_site.side_effect = requests.ConnectionError
+        args = parse_args(["-a", "batch.txt"])
+        files = {1: File("Example.jpg", site=DEFAULT_SITE)}
+
+        groups = list(prefetch_image_info(files, args))
+
+        assert not mock_query_api_batch.called
+        assert groups == [files]
+
+
+class TestDropCache:
+    """Define tests related to wikiget.dl.drop_cache."""
+
+    def test_drop_cache_small_file(self, tmp_path: Path) -> None:
+        """Test that small files aren't synced to disk just to drop their pages."""
+        with (tmp_path / "Example.jpg").open("wb") as fd, patch(
+            "wikiget.dl.os.fdatasync", create=True
+        ) as mock_fdatasync, patch(
+            "wikiget.dl.os.posix_fadvise", create=True
+        ) as mock_posix_fadvise:
+            drop_cache(fd, DROP_CACHE_MIN_SIZE - 1)
+
+        assert not mock_fdatasync.called
+        assert not mock_posix_fadvise.called
+
+    def test_drop_cache_large_file(self, tmp_path: Path) -> None:
+        """Test that large files are synced to disk before their pages are dropped."""
+        calls = MagicMock()
+        with (tmp_path / "Example.jpg").open("wb") as fd, patch(
+            "wikiget.dl.os.fdatasync", calls.fdatasync, create=True
+        ), patch("wikiget.dl.os.posix_fadvise", calls.posix_fadvise, create=True):
+            drop_cache(fd, DROP_CACHE_MIN_SIZE)
+
+        assert [name for name, _, _ in calls.mock_calls] == [
+            "fdatasync",
+            "posix_fadvise",
+        ]
+
 
 @pytest.mark.usefixtures("_mock_get")
 class TestDownload:
     """Define tests related to wikiget.dl.download."""
 
     @pytest.fixture()
-    def mock_file(self) -> File:
+    def mock_file(self, tmp_path: Path) -> File:
         """Create a mock File object to test against.
 
+        Each test gets its own destination directory, so that files downloaded by one
+        test don't already exist in the next one.
+
+        :param tmp_path: temporary directory unique to the test
+        :type tmp_path: pathlib.Path
         :return: mock File object
         :rtype: File
         """
-        file = File(name="Example.jpg")
+        file = File(name="Example.jpg", dest=str(tmp_path / "Example.jpg"))
         file.image = Mock()
         file.image.imageinfo = {
             "url": "https://upload.wikimedia.org/wikipedia/commons/a/a9/Example.jpg",
-            "size": 9022,
-            "sha1": "d01b79a6781c72ac9bfff93e5e2cfbeef4efc840",
+            "size": 142,
+            "sha1": "cd19c009a30ca9b68045415a3a0838e64f3c2443",
         }
         file.image.site = MagicMock(Site)
         file.image.site.host = "commons.wikimedia.org"
         file.image.site.connection = requests.Session()
         return file
 
-    @patch("wikiget.dl.verify_hash")
-    def test_download(
-        self,
-        mock_verify_hash: MagicMock,
-        mock_file: File,
-        caplog: pytest.LogCaptureFixture,
-    ) -> None:
+    def test_download(self, mock_file: File, caplog: pytest.LogCaptureFixture) -> None:
         """Test that the correct log messages are created when downloading a file.
 
         There should be a series of info-level messages containing the filename, size,
@@ -363,8 +503,6 @@ class TestDownload:
         """
         caplog.set_level(logging.INFO)
 
-        mock_verify_hash.return_value = "d01b79a6781c72ac9bfff93e5e2cfbeef4efc840"
-
         args = parse_args(["File:Example.jpg"])
         errors = download(mock_file, args)
 
@@ -372,7 +510,7 @@ class TestDownload:
             (
                 "wikiget.dl",
                 logging.INFO,
-                "[Example.jpg] Downloading 'Example.jpg' (9022 bytes) from "
+                "[Example.jpg] Downloading 'Example.jpg' (142 bytes) from "
                 "commons.wikimedia.org",
             ),
             (
@@ -385,25 +523,21 @@ class TestDownload:
                 "wikiget.dl",
                 logging.INFO,
                 "[Example.jpg] Remote file SHA1 is "
-                "d01b79a6781c72ac9bfff93e5e2cfbeef4efc840",
+                "cd19c009a30ca9b68045415a3a0838e64f3c2443",
             ),
             (
                 "wikiget.dl",
                 logging.INFO,
                 "[Example.jpg] Local file SHA1 is "
-                "d01b79a6781c72ac9bfff93e5e2cfbeef4efc840",
+                "cd19c009a30ca9b68045415a3a0838e64f3c2443",
             ),
             ("wikiget.dl", logging.INFO, "[Example.jpg] Hashes match!"),
             ("wikiget.dl", logging.INFO, "[Example.jpg] 'Example.jpg' downloaded"),
         ]
         assert errors == 0
 
-    @patch("wikiget.dl.verify_hash")
     def test_download_with_output(
-        self,
-        mock_verify_hash: MagicMock,
-        mock_file: File,
-        caplog: pytest.LogCaptureFixture,
+        self, mock_file: File, caplog: pytest.LogCaptureFixture
     ) -> None:
         """Test that the correct log messages are created when downloading a file.
 
@@ -412,7 +546,6 @@ class TestDownload:
         caplog.set_level(logging.INFO)
 
         tmp_file = mock_file.dest
-        mock_verify_hash.return_value = "d01b79a6781c72ac9bfff93e5e2cfbeef4efc840"
 
         args = parse_args(["-o", str(tmp_file), "File:Example.jpg"])
         errors = download(mock_file, args)
@@ -420,7 +553,7 @@ class TestDownload:
         assert caplog.record_tuples[0] == (
             "wikiget.dl",
             logging.INFO,
-            "[Example.jpg] Downloading 'Example.jpg' (9022 bytes) from "
+            "[Example.jpg] Downloading 'Example.jpg' (142 bytes) from "
             f"commons.wikimedia.org to '{tmp_file}'",
         )
         assert caplog.record_tuples[5] == (
@@ -430,6 +563,119 @@ class TestDownload:
         )
         assert errors == 0
 
+    def test_download_contents(self, mock_file: File, test_file: Path) -> None:
+        """Test that the downloaded file contains the bytes served by the site."""
+        args = parse_args(["-f", "File:Example.jpg"])
+        errors = download(mock_file, args)
+
+        assert mock_file.dest.read_bytes() == test_file.read_bytes()
+        assert errors == 0
+
+    def test_download_identity_encoding(
+        self, mock_file: File, requests_mock: rm.Mocker
+    ) -> None:
+        """Test that files are requested without any transfer compression."""
+        args = parse_args(["File:Example.jpg"])
+        _ = download(mock_file, args)
+
+        request = requests_mock.last_request
+        assert request is not None
+        assert request.headers["Accept-Encoding"] == "identity"
+
+    def test_download_existing_file(
+        self, mock_file: File, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Test that an existing file isn't overwritten unless forced.
+
+        The file may be created after prep_download checked for it, e.g. by another
+        download in the same batch, so download itself should refuse to overwrite it.
+        """
+        mock_file.dest.write_bytes(b"existing")
+
+        args = parse_args(["File:Example.jpg"])
+        errors = download(mock_file, args)
+
+        assert mock_file.dest.read_bytes() == b"existing"
+        assert caplog.record_tuples == [
+            (
+                "wikiget.dl",
+                logging.WARNING,
+                (
+                    "[Example.jpg] File already exists; skipping download "
+                    "(use -f to force)"
+                ),
+            ),
+        ]
+        assert errors == 1
+
+    def test_download_update_current(
+        self,
+        mock_file: File,
+        test_file: Path,
+        requests_mock: rm.Mocker,
+        caplog: pytest.LogCaptureFixture,
+    ) -> None:
+        """Test that an up-to-date file isn't downloaded again when updating."""
+        caplog.set_level(logging.INFO)
+        mock_file.dest.write_bytes(test_file.read_bytes())
+
+        args = parse_args(["-U", "File:Example.jpg"])
+        errors = download(mock_file, args)
+
+        assert not requests_mock.called
+        assert caplog.record_tuples[2:] == [
+            (
+                "wikiget.dl",
+                logging.INFO,
+                "[Example.jpg] Local file is already up to date; skipping download",
+            ),
+        ]
+        assert errors == 0
+
+    def test_download_update_outdated(self, mock_file: File, test_file: Path) -> None:
+        """Test that an existing file is overwritten when updating if it's different."""
+        mock_file.dest.write_bytes(b"existing")
+
+        args = parse_args(["-U", "File:Example.jpg"])
+        errors = download(mock_file, args)
+
+        assert mock_file.dest.read_bytes() == test_file.read_bytes()
+        assert errors == 0
+
+    def test_download_size_mismatch(
+        self, mock_file: File, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Test that an error is logged if the response doesn't match the file size."""
+        mock_file.image.imageinfo["size"] = 9022
+
+        args = parse_args(["File:Example.jpg"])
+        errors = download(mock_file, args)
+
+        assert caplog.record_tuples == [
+            (
+                "wikiget.dl",
+                logging.ERROR,
+                "[Example.jpg] Size mismatch! Expected 9022 bytes but received 142.",
+            ),
+        ]
+        assert errors == 1
+
+    def test_download_write_error_closes_response(self, mock_file: File) -> None:
+        """Test that the response is closed if the file can't be written.
+
+        Otherwise its connection would never be returned to the session's pool.
+        """
+        mock_file.image.site.connection = MagicMock()
+        response = mock_file.image.site.connection.get.return_value
+
+        args = parse_args(["File:Example.jpg"])
+        with patch("wikiget.dl.shutil.copyfileobj") as mock_copyfileobj:
+            mock_copyfileobj.side_effect = OSError("No space left on device")
+            errors = download(mock_file, args)
+
+        assert response.__exit__.called
+        assert errors == 1
+
     def test_download_dry_run(
         self, mock_file: File, caplog: pytest.LogCaptureFixture
     ) -> None:
@@ -468,44 +714,14 @@ class TestDownload:
         ]
         assert errors == 1
 
-    @patch("wikiget.dl.verify_hash")
-    def test_download_verify_os_error(
-        self,
-        mock_verify_hash: MagicMock,
-        mock_file: File,
-        caplog: pytest.LogCaptureFixture,
-    ) -> None:
-        """Test what happens when an OSError is raised during verification.
-
-        If the downloaded file cannot be read in order to calculate its hash, an error
-        log message should be created with details on the exception.
-        """
-        mock_verify_hash.side_effect = OSError("read error")
-
-        args = parse_args(["File:Example.jpg"])
-        errors = download(mock_file, args)
-
-        assert caplog.record_tuples == [
-            (
-                "wikiget.dl",
-                logging.ERROR,
-                "[Example.jpg] File downloaded but could not be verified: read error",
-            )
-        ]
-        assert errors == 1
-
-    @patch("wikiget.dl.verify_hash")
     def test_download_verify_hash_mismatch(
-        self,
-        mock_verify_hash: MagicMock,
-        mock_file: File,
-        caplog: pytest.LogCaptureFixture,
+        self, mock_file: File, caplog: pytest.LogCaptureFixture
     ) -> None:
         """Test what happens when the downloaded file hash and server hash don't match.
 
         An error log message should be created if there's a hash mismatch.
         """
-        mock_verify_hash.return_value = "mismatch"
+        mock_file.image.imageinfo["sha1"] = "mismatch"
 
         args = parse_args(["File:Example.jpg"])
         errors = download(mock_file, args)
@@ -536,3 +752,99 @@ class TestDownload:
             ),
         ]
         assert errors == 1
+
+
+class TestDownloadInterrupted:
+    """Define tests related to wikiget.dl.download when the transfer is cut short."""
+
+    @pytest.fixture()
+    def short_url(self, test_file: Path) -> Iterator[str]:
+        """Serve the test file over HTTP, closing the connection partway through.
+
+        The response's Content-Length is the size of the whole file, but only the first
+        100 bytes are sent before the connection is closed.
+
+        :param test_file: test file
+        :type test_file: pathlib.Path
+        :return: URL of the truncated file
+        :rtype: str
+        """
+        body = test_file.read_bytes()
+
+        class ShortBodyHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:100])
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), ShortBodyHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}/Example.jpg"
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture()
+    def short_file(self, short_url: str, test_file: Path, tmp_path: Path) -> File:
+        """Create a File object whose download will be cut short.
+
+        :param short_url: URL of the truncated file
+        :type short_url: str
+        :param test_file: test file
+        :type test_file: pathlib.Path
+        :param tmp_path: temporary directory unique to the test
+        :type tmp_path: pathlib.Path
+        :return: File object
+        :rtype: File
+        """
+        file = File(name="Example.jpg", dest=str(tmp_path / "Example.jpg"))
+        file.image = Mock()
+        file.image.imageinfo = {
+            "url": short_url,
+            "size": test_file.stat().st_size,
+            "sha1": "cd19c009a30ca9b68045415a3a0838e64f3c2443",
+        }
+        file.image.site = MagicMock(Site)
+        file.image.site.host = "127.0.0.1"
+        file.image.site.connection = requests.Session()
+        return file
+
+    def test_download_interrupted(
+        self, short_file: File, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Test that a connection closed partway through the file is logged as an error.
+
+        The error should be reported for that file rather than raised, so that a batch
+        download can carry on with its other files.
+        """
+        args = parse_args(["File:Example.jpg"])
+        errors = download(short_file, args)
+
+        assert caplog.record_tuples == [
+            (
+                "wikiget.dl",
+                logging.ERROR,
+                "[Example.jpg] Size mismatch! Expected 142 bytes but received 100. "
+                "Download may have been interrupted.",
+            ),
+        ]
+        assert errors == 1
+
+    def test_download_interrupted_truncates_file(
+        self, short_file: File, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that an interrupted download doesn't leave the preallocated space.
+
+        The file on disk should only be as large as the data actually received. urllib3
+        discards the data from a read that fails, so the block size is reduced to one
+        that evenly divides the truncated body, letting all of it reach the file.
+        """
+        monkeypatch.setattr("wikiget.DOWNLOAD_BLOCKSIZE", 10)
+        args = parse_args(["File:Example.jpg"])
+        download(short_file, args)
+
+        assert short_file.dest.stat().st_size == 100
@@ -19,6 +19,8 @@
 
 from __future__ import annotations
 
+import pytest
+
 from wikiget import DEFAULT_SITE
 from wikiget.file import File
 
@@ -55,6 +57,17 @@ class TestFileClass:
         file = File("foobar.jpg", site="en.wikipedia.org")
         assert file.site == "en.wikipedia.org"
 
+    def test_file_site_is_shared(self) -> None:
+        """Files from the same site should share a single copy of the site name."""
+        first = File("foo.jpg", site="".join(["en.", "wikipedia.org"]))
+        second = File("bar.jpg", site="".join(["en.", "wikipedia.org"]))
+        assert first.site is second.site
+
+    def test_file_has_no_dict(self, file_with_name: File) -> None:
+        """Test that File instances don't allow arbitrary attributes to be set."""
+        with pytest.raises(AttributeError):
+            file_with_name.foo = "bar"  # type: ignore[attr-defined]
+
 
 class TestFileComparison:
     """Define tests related to wikiget.file.File comparisons."""
@@ -43,6 +43,22 @@ class TestLogging:
         adapter.warning("test log")
         assert "[Example.jpg] test log" in caplog.text
 
+    def test_custom_log_adapter_with_args(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Percent signs in the filename shouldn't interfere with message arguments."""
+        adapter = FileLogAdapter(self.logger, {"filename": "100%_Example.jpg"})
+        adapter.warning("test log %s", "with args")
+        assert "[100%_Example.jpg] test log with args" in caplog.text
+
+    def test_custom_log_adapter_without_args(
+        self, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Percent signs in the filename should be left alone if there are no args."""
+        adapter = FileLogAdapter(self.logger, {"filename": "100%_Example.jpg"})
+        adapter.warning("test log")
+        assert "[100%_Example.jpg] test log" in caplog.text
+
     def test_file_logging(self) -> None:
         """Logging to a file should create the file in the specified location."""
         logfile_location = Path("test.log")
@@ -54,8 +70,8 @@ class TestLogging:
         """The default log level should be set to WARNING."""
         args = parse_args(["File:Example.jpg"])
         configure_logging(args.verbose, args.logfile, quiet=args.quiet)
-        # each call of configure_logging() adds a new handler to the logger, so we need
-        # to grab the most recently added one to test
+        # the logger may have other handlers (e.g. from pytest), so grab the most
+        # recently added one to test
         handler = self.logger.handlers[-1]
         assert handler.level == logging.WARNING
 
@@ -79,3 +95,24 @@ class TestLogging:
         configure_logging(args.verbose, args.logfile, quiet=args.quiet)
         handler = self.logger.handlers[-1]
         assert handler.level == logging.ERROR
+
+    def test_repeated_logging_configuration(self) -> None:
+        """Configuring logging again should replace the handlers added previously."""
+        args = parse_args(["File:Example.jpg"])
+        configure_logging(args.verbose, args.logfile, quiet=args.quiet)
+        handler_count = len(self.logger.handlers)
+        configure_logging(args.verbose, args.logfile, quiet=args.quiet)
+        assert len(self.logger.handlers) == handler_count
+
+    def test_filtered_records_not_created(self) -> None:
+        """Messages below the console log level shouldn't be processed at all."""
+        args = parse_args(["File:Example.jpg"])
+        configure_logging(args.verbose, args.logfile, quiet=args.quiet)
+        adapter = FileLogAdapter(self.logger, {"filename": "Example.jpg"})
+        assert not adapter.isEnabledFor(logging.INFO)
+
+    def test_file_logging_level(self) -> None:
+        """When logging to a file, debug messages should still be created."""
+        args = parse_args(["File:Example.jpg", "-l", "test.log"])
+        configure_logging(args.verbose, args.logfile, quiet=args.quiet)
+        assert self.logger.isEnabledFor(logging.DEBUG)
@@ -134,7 +134,7 @@ class TestReadBatchFile:
         :return: dictionary representation of the input file
         :rtype: dict[int, str]
         """
-        return read_batch_file(str(batch_file))
+        return dict(read_batch_file(str(batch_file)))
 
     def test_batch_file_log(
         self, caplog: pytest.LogCaptureFixture, batch_file: Path
@@ -145,7 +145,7 @@ class TestReadBatchFile:
         of the batch file.
         """
         caplog.set_level(logging.INFO)
-        _ = read_batch_file(str(batch_file))
+        _ = list(read_batch_file(str(batch_file)))
         assert f"Using file '{batch_file}' for batch download" in caplog.text
 
     def test_batch_file_length(self, dl_dict: dict[int, str]) -> None:
@@ -173,7 +173,7 @@ class TestReadBatchFile:
         monkeypatch.setattr(
             "sys.stdin", io.StringIO("File:Foo.jpg\nFile:Bar.jpg\nFile:Baz.jpg\n")
         )
-        return read_batch_file("-")
+        return dict(read_batch_file("-"))
 
     def test_batch_stdin_log(
         self, caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
@@ -181,7 +181,7 @@ class TestReadBatchFile:
         """Test that using stdin for batch processing creates an info log message."""
         caplog.set_level(logging.INFO)
         monkeypatch.setattr("sys.stdin", io.StringIO("File:Foo.jpg\n"))
-        _ = read_batch_file("-")
+        _ = list(read_batch_file("-"))
         assert "Using stdin for batch download" in caplog.text
 
     def test_batch_stdin_length(self, dl_dict_stdin: dict[int, str]) -> None:
@@ -211,7 +211,7 @@ class TestReadBatchFile:
         :return: dictionary representation of the input file
         :rtype: dict[int, str]
         """
-        return read_batch_file(str(batch_file_with_comment))
+        return dict(read_batch_file(str(batch_file_with_comment)))
 
     def test_batch_file_with_comment_length(
         self, dl_dict_with_comment: dict[int, str]
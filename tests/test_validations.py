@@ -20,6 +20,7 @@
 from __future__ import annotations
 
 from typing import TYPE_CHECKING
+from unittest.mock import Mock
 
 import pytest
 
@@ -171,3 +172,16 @@ class TestVerifyHash:
         expected_sha1 = "cd19c009a30ca9b68045415a3a0838e64f3c2443"
 
         assert verify_hash(test_file) == expected_sha1
+
+    def test_verify_hash_read_loop(
+        self, test_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Confirm that the read loop used before Python 3.11 returns the same hash.
+
+        A small block size is used so that the file is read in several pieces.
+        """
+        monkeypatch.setattr("wikiget.validations.sys", Mock(version_info=(3, 10)))
+        monkeypatch.setattr("wikiget.validations.BLOCKSIZE", 16)
+        expected_sha1 = "cd19c009a30ca9b68045415a3a0838e64f3c2443"
+
+        assert verify_hash(test_file) == expected_sha1
@@ -20,15 +20,18 @@
 from __future__ import annotations
 
 import logging
+import subprocess
+import sys
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from wikiget import USER_AGENT, __version__
+import wikiget
+from wikiget import __version__, get_user_agent
 from wikiget.wikiget import cli
 
 
-@patch("wikiget.wikiget.process_download")
+@patch("wikiget.dl.process_download")
 class TestWikigetCli:
     """Define tests related to wikiget.wikiget.cli."""
 
@@ -78,12 +81,13 @@ class TestWikigetCli:
         """When program execution starts, it should create the right log messages.
 
         There should be an info log record with the program version as well as a debug
-        record with the user agent we're sending to the API.
+        record with the user agent we're sending to the API. Records below the console
+        log level aren't created at all, so -vv is needed to see both.
         """
         with monkeypatch.context() as m:
             # pretend process_download was successful
             mock_process_download.return_value = 0
-            m.setattr("sys.argv", ["wikiget", "File:Example.jpg"])
+            m.setattr("sys.argv", ["wikiget", "-vv", "File:Example.jpg"])
 
             code = cli()
 
@@ -97,7 +101,7 @@ class TestWikigetCli:
             (
                 "wikiget.wikiget",
                 logging.DEBUG,
-                f"User agent: {USER_AGENT}",
+                f"User agent: {get_user_agent()}",
             ),
         ]
 
@@ -118,9 +122,31 @@ class TestWikigetCli:
             code = cli()
 
         assert code == 130
-        # ignore the first two messages, since they're tested elsewhere
-        assert caplog.record_tuples[2] == (
+        assert caplog.record_tuples[-1] == (
             "wikiget.wikiget",
             logging.CRITICAL,
             "Interrupted by user",
         )
+
+
+class TestLazyImports:
+    """Define tests related to deferring slow imports until they're needed."""
+
+    def test_cli_import(self) -> None:
+        """Importing the CLI module shouldn't import mwclient.
+
+        This is checked in a new interpreter, since mwclient will already have been
+        imported by other tests.
+        """
+        code = "import sys, wikiget.wikiget; print('mwclient' in sys.modules)"
+        result = subprocess.run(  # noqa: S603
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        assert result.stdout.strip() == "False"
+
+    def test_user_agent_attribute(self) -> None:
+        """The USER_AGENT attribute should still be available."""
+        assert wikiget.USER_AGENT == get_user_agent()